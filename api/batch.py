@@ -0,0 +1,204 @@
+"""
+Offline batch runner for precomputing forecast scenarios
+
+Reads scenarios from a JSONL file, one per line:
+    {"scenario_id": "autumn_2024", "growth_rates": {"inflation": {"2026": 0.02}}}
+Growth rates not given in a scenario fall back to the default OBR forecast.
+
+Scenarios run across worker processes. Each completed scenario is appended to
+checkpoint.jsonl in the output directory, so an interrupted run resumes where
+it stopped. Metrics are then written as Parquet tables, and optionally as a
+cache seed file that the API loads at startup via CACHE_SEED_FILE.
+
+Usage:
+    python -m api.batch scenarios.jsonl output/ --workers 2 --cache-seed output/cache_seed.json
+"""
+import argparse
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from api.utils.forecast import (
+    GROWFACTORS,
+    FORECAST_YEARS,
+    SIMULATION_BACKEND,
+    get_forecast_metrics,
+    get_cache_key_for_computation,
+)
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+YEARLY_METRICS = [
+    "median_income_by_year",
+    "absolute_poverty_ahc_by_year",
+    "absolute_poverty_bhc_by_year",
+    "relative_poverty_ahc_by_year",
+    "relative_poverty_bhc_by_year",
+]
+
+
+def get_growth_rates(overrides: Dict[str, Dict[str, float]]) -> Dict[str, Dict[int, float]]:
+    """Apply scenario growth rates over the defaults, in the form the API uses"""
+    unknown = set(overrides) - set(GROWFACTORS)
+    if unknown:
+        raise ValueError(f"Unknown growth rate factors: {', '.join(sorted(unknown))}")
+    growth_rates = {}
+    for factor, defaults in GROWFACTORS.items():
+        factor_overrides = {int(year): value for year, value in overrides.get(factor, {}).items()}
+        unknown_years = set(factor_overrides) - set(FORECAST_YEARS)
+        if unknown_years:
+            raise ValueError(
+                f"Years outside the forecast period for {factor}: {', '.join(map(str, sorted(unknown_years)))}"
+            )
+        growth_rates[factor] = {
+            year: float(factor_overrides.get(year, defaults[year])) for year in FORECAST_YEARS
+        }
+    return growth_rates
+
+
+def read_scenarios(path: str) -> List[Dict[str, Any]]:
+    """Read scenarios from a JSONL file, checking scenario IDs are unique"""
+    scenarios = []
+    seen = set()
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            scenario = json.loads(line)
+            scenario_id = scenario.get("scenario_id")
+            if not scenario_id:
+                raise ValueError(f"Line {line_number}: missing scenario_id")
+            if scenario_id in seen:
+                raise ValueError(f"Line {line_number}: duplicate scenario_id {scenario_id}")
+            seen.add(scenario_id)
+            try:
+                growth_rates = get_growth_rates(scenario.get("growth_rates", {}))
+            except ValueError as e:
+                raise ValueError(f"Line {line_number}: {e}") from e
+            scenarios.append({
+                "scenario_id": scenario_id,
+                "growth_rates": growth_rates,
+                "cache_key": get_cache_key_for_computation(growth_rates),
+            })
+    return scenarios
+
+
+def read_checkpoint(path: str) -> Dict[str, Dict[str, Any]]:
+    """Read completed scenarios from the checkpoint file, keyed by scenario ID"""
+    completed = {}
+    if not os.path.exists(path):
+        return completed
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A partial line from an interrupted run; the scenario will be rerun
+                continue
+            completed[entry["scenario_id"]] = entry
+    return completed
+
+
+def run_scenario(scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a single scenario in a worker process"""
+    return get_forecast_metrics(scenario["growth_rates"])
+
+
+def write_tables(completed: Dict[str, Dict[str, Any]], output_dir: str) -> None:
+    """Write metrics for all completed scenarios as Parquet tables"""
+    yearly_rows = []
+    decile_rows = []
+    for scenario_id, entry in sorted(completed.items()):
+        result = entry["result"]
+        for metric in YEARLY_METRICS:
+            for row in result[metric]:
+                yearly_rows.append({
+                    "scenario_id": scenario_id,
+                    "metric": metric.replace("_by_year", ""),
+                    "year": row["year"],
+                    "value": row["value"],
+                })
+        for row in result["decile_yearly_changes"]:
+            decile_rows.append({"scenario_id": scenario_id, **row})
+
+    pd.DataFrame(yearly_rows, columns=["scenario_id", "metric", "year", "value"]).to_parquet(
+        os.path.join(output_dir, "yearly_metrics.parquet"), index=False
+    )
+    pd.DataFrame(decile_rows, columns=["scenario_id", "decile", "year", "change"]).to_parquet(
+        os.path.join(output_dir, "decile_yearly_changes.parquet"), index=False
+    )
+
+
+def write_cache_seed(completed: Dict[str, Dict[str, Any]], path: str) -> None:
+    """Write results keyed by the API's computation cache key, recording the backend"""
+    seed = {
+        "backend": SIMULATION_BACKEND,
+        "results": {entry["cache_key"]: entry["result"] for entry in completed.values()},
+    }
+    with open(path, "w") as f:
+        json.dump(seed, f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run forecast scenarios in parallel and write results to disk")
+    parser.add_argument("scenarios", help="JSONL file of scenarios")
+    parser.add_argument("output_dir", help="Directory for the checkpoint and output tables")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes; each runs a full microsimulation needing "
+                             "several GB of memory, so memory rather than CPU count is the limit")
+    parser.add_argument("--cache-seed", help="Also write a cache seed file for the API to this path")
+    args = parser.parse_args()
+    if args.cache_seed and SIMULATION_BACKEND != "policyengine":
+        parser.error(f"--cache-seed requires the policyengine backend, not {SIMULATION_BACKEND}")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    checkpoint_path = os.path.join(args.output_dir, CHECKPOINT_FILE)
+
+    scenarios = read_scenarios(args.scenarios)
+    completed = read_checkpoint(checkpoint_path)
+    for scenario in scenarios:
+        entry = completed.get(scenario["scenario_id"])
+        if entry and entry["cache_key"] != scenario["cache_key"]:
+            # Growth rates changed since the checkpoint was written, so the result is stale
+            print(f"Growth rates for {scenario['scenario_id']} have changed; rerunning it", file=sys.stderr)
+            del completed[scenario["scenario_id"]]
+    pending = [scenario for scenario in scenarios if scenario["scenario_id"] not in completed]
+    print(f"{len(scenarios)} scenarios, {len(scenarios) - len(pending)} already complete, {len(pending)} to run")
+
+    failures = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor, open(checkpoint_path, "a") as checkpoint:
+            futures = {executor.submit(run_scenario, scenario): scenario for scenario in pending}
+            for future in as_completed(futures):
+                scenario_id = futures[future]["scenario_id"]
+                try:
+                    result = future.result()
+                except Exception:
+                    failures += 1
+                    print(f"Scenario {scenario_id} failed:", file=sys.stderr)
+                    traceback.print_exc()
+                    continue
+                entry = {"scenario_id": scenario_id, "cache_key": futures[future]["cache_key"], "result": result}
+                checkpoint.write(json.dumps(entry) + "\n")
+                checkpoint.flush()
+                completed[scenario_id] = entry
+                print(f"Completed {scenario_id} ({len(completed)}/{len(scenarios)})")
+
+    # Only write outputs for scenarios in this file, even if the checkpoint has others
+    scenario_ids = {scenario["scenario_id"] for scenario in scenarios}
+    completed = {scenario_id: entry for scenario_id, entry in completed.items() if scenario_id in scenario_ids}
+    write_tables(completed, args.output_dir)
+    if args.cache_seed:
+        write_cache_seed(completed, args.cache_seed)
+
+    if failures:
+        print(f"{failures} scenarios failed; rerun to retry them", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
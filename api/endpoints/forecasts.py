@@ -21,6 +21,8 @@ class GrowthRates(BaseModel):
 class ForecastRequest(BaseModel):
     forecast_id: str
     growth_rates: Optional[GrowthRates] = None
+    client_id: Optional[str] = Field(None, description="Identifier for the browser session making the request")
+    supersede: bool = Field(False, description="Cancel this client's previous computation if it is still running")
 
 class DecileImpact(BaseModel):
     decile: int
@@ -90,10 +92,10 @@ async def calculate_forecast_impact(request: ForecastRequest):
                     "status": "completed",
                     "result": result
                 }
-            elif computation["status"] == "failed":
+            elif computation["status"] in ("failed", "cancelled"):
                 return {
                     "computation_id": actual_computation_id,
-                    "status": "failed",
+                    "status": computation["status"],
                     "error": computation.get("error", "Unknown error")
                 }
             else:
@@ -115,7 +117,7 @@ async def calculate_forecast_impact(request: ForecastRequest):
             }
         
         # Start the computation in a background thread
-        computation_id = start_computation(growth_rates)
+        computation_id = start_computation(growth_rates, request.client_id, request.supersede)
         
         # Return the computation ID
         return {
@@ -0,0 +1,259 @@
+"""
+Concurrent load test for the submit-and-poll forecast impact flow
+
+Simulates many browsers adjusting growth rate sliders. As in the frontend,
+slider changes only update local state; clicking "Analyze" submits a new
+computation to /api/forecasts/impact, and the latest computation is then
+polled with "computation_id:<id>" until it completes. Runs against the app
+in-process or against a server over HTTP.
+
+Usage:
+    python -m api.loadtest --users 20 --duration 120
+    SIMULATION_BACKEND=stub make api
+    python -m api.loadtest --url http://localhost:8000 --users 20
+"""
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Slider granularity and range around the default growth rates
+SLIDER_STEP = 0.005
+SLIDER_RANGE = 4
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarise(values: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+    }
+
+
+class Recorder:
+    """Collects request latencies and outcomes across all simulated users"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {"submit": [], "poll": []}
+        self.errors: Dict[str, int] = {"submit": 0, "poll": 0}
+        self.time_to_result: List[float] = []
+        self.results = {"completed": 0, "failed": 0, "cancelled": 0, "abandoned": 0}
+
+    async def post(self, client: httpx.AsyncClient, kind: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Send a request to the impact endpoint, recording its latency"""
+        start = time.perf_counter()
+        try:
+            response = await client.post("/api/forecasts/impact", json=payload)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError:
+            self.errors[kind] += 1
+            return None
+        finally:
+            self.latencies[kind].append(time.perf_counter() - start)
+
+
+async def simulate_user(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    default_rates: Dict[str, Dict[str, float]],
+    rng: random.Random,
+    args: argparse.Namespace,
+    deadline: float,
+    client_id: str,
+) -> None:
+    """Simulate one browser dragging sliders and polling for results"""
+    rates = copy.deepcopy(default_rates)
+    computation_id = None
+    submitted_at = 0.0
+    # Stagger arrivals so users don't all start at the same instant
+    next_change = time.monotonic() + rng.uniform(0, args.ramp_up)
+    next_poll = float("inf")
+    drag_remaining = 0
+    factor, year = None, None
+
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+
+        if now >= next_change:
+            if drag_remaining == 0:
+                # Start dragging a new slider
+                factor = rng.choice(list(rates))
+                year = rng.choice(list(rates[factor]))
+                drag_remaining = rng.randint(1, args.max_drag_changes)
+                direction = rng.choice([-1, 1])
+            offset = round((rates[factor][year] - default_rates[factor][year]) / SLIDER_STEP) + direction
+            offset = max(-SLIDER_RANGE, min(SLIDER_RANGE, offset))
+            rates[factor][year] = round(default_rates[factor][year] + offset * SLIDER_STEP, 4)
+            drag_remaining -= 1
+            if drag_remaining > 0:
+                next_change = now + rng.uniform(args.drag_interval_min, args.drag_interval_max)
+            else:
+                # The user may adjust and re-analyze before the current result arrives
+                next_change = now + rng.expovariate(1 / args.think_time)
+
+            # Slider changes are local edits until the drag ends and "Analyze" is clicked
+            if drag_remaining > 0 and not args.submit_per_step:
+                continue
+
+            if computation_id:
+                recorder.results["abandoned"] += 1
+            data = await recorder.post(client, "submit", {
+                "forecast_id": "custom",
+                "growth_rates": rates,
+                "client_id": client_id,
+                "supersede": args.supersede,
+            })
+            computation_id = data["computation_id"] if data else None
+            submitted_at = time.monotonic()
+            # The frontend checks once immediately, then on an interval
+            next_poll = submitted_at if computation_id else float("inf")
+            continue
+
+        if computation_id and now >= next_poll:
+            data = await recorder.post(client, "poll", {
+                "forecast_id": f"computation_id:{computation_id}",
+                "growth_rates": rates,
+            })
+            status = data["status"] if data else "failed"
+            if status in ("completed", "failed", "cancelled"):
+                recorder.results[status] += 1
+                if status == "completed":
+                    recorder.time_to_result.append(time.monotonic() - submitted_at)
+                computation_id = None
+                next_poll = float("inf")
+                # Read the results before touching a slider again
+                next_change = time.monotonic() + rng.expovariate(1 / args.think_time)
+            else:
+                next_poll = time.monotonic() + args.poll_interval
+            continue
+
+        await asyncio.sleep(max(min(next_change, next_poll, deadline) - time.monotonic(), 0))
+
+
+async def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the load test and return a report"""
+    if args.url:
+        transport = None
+        base_url = args.url
+    else:
+        # Select the backend before the forecast module reads it
+        os.environ["SIMULATION_BACKEND"] = args.backend
+        from api.main import app
+        # Per-request access logs would swamp the report
+        logging.getLogger("api.main").setLevel(logging.WARNING)
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://loadtest"
+
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout) as client:
+        forecasts = (await client.get("/api/forecasts")).json()
+        default_rates = forecasts["default_growth_rates"]
+        stats_before = (await client.get("/api/computations/stats")).json()
+
+        recorder = Recorder()
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*[
+            simulate_user(
+                client, recorder, default_rates, random.Random(args.seed + user), args, deadline, f"loadtest-{user}"
+            )
+            for user in range(args.users)
+        ])
+        elapsed = time.monotonic() - start
+
+        stats_after = (await client.get("/api/computations/stats")).json()
+
+    total_requests = sum(len(values) for values in recorder.latencies.values())
+    return {
+        "users": args.users,
+        "duration_seconds": elapsed,
+        "backend": stats_after["backend"],
+        "requests": total_requests,
+        "throughput_rps": total_requests / elapsed,
+        "submit_latency": summarise(recorder.latencies["submit"]),
+        "poll_latency": summarise(recorder.latencies["poll"]),
+        "errors": recorder.errors,
+        "results": recorder.results,
+        "results_per_minute": recorder.results["completed"] / elapsed * 60,
+        "time_to_result": summarise(recorder.time_to_result),
+        "computations": {
+            key: stats_after[key] - stats_before[key]
+            for key in ("started", "cache_hits", "duplicates", "completed", "failed", "cancelled")
+        },
+        "peak_memory_mb": stats_after["peak_memory_mb"],
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print a human-readable summary of the load test"""
+    print(f"Users: {report['users']} over {report['duration_seconds']:.1f}s ({report['backend']} backend)")
+    print(f"Requests: {report['requests']} ({report['throughput_rps']:.2f} req/s)")
+    for kind in ("submit_latency", "poll_latency", "time_to_result"):
+        summary = report[kind]
+        print(
+            f"{kind}: n={summary['count']} "
+            f"p50={summary['p50_ms']:.1f}ms p95={summary['p95_ms']:.1f}ms p99={summary['p99_ms']:.1f}ms"
+        )
+    print(f"Errors: {report['errors']}")
+    print(f"Results: {report['results']} ({report['results_per_minute']:.2f} completed/min)")
+    print(f"Computations: {report['computations']}")
+    print(f"Peak memory: {report['peak_memory_mb']:.1f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the forecast impact submit-and-poll flow")
+    parser.add_argument("--url", help="Base URL of a running server; runs the app in-process if omitted")
+    parser.add_argument("--backend", default="stub", choices=["stub", "policyengine"],
+                        help="Simulation backend for in-process runs; ignored with --url, "
+                             "where the server's SIMULATION_BACKEND applies")
+    parser.add_argument("--users", type=int, default=10, help="Number of concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=60, help="Test duration in seconds")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds over which users arrive")
+    parser.add_argument("--poll-interval", type=float, default=10, help="Seconds between status polls")
+    parser.add_argument("--think-time", type=float, default=15,
+                        help="Mean seconds between slider interactions")
+    parser.add_argument("--max-drag-changes", type=int, default=5,
+                        help="Maximum slider steps in one drag before clicking Analyze")
+    parser.add_argument("--drag-interval-min", type=float, default=0.2,
+                        help="Minimum seconds between changes within a drag")
+    parser.add_argument("--drag-interval-max", type=float, default=1.5,
+                        help="Maximum seconds between changes within a drag")
+    parser.add_argument("--submit-per-step", action="store_true",
+                        help="Submit a computation on every slider step rather than once per drag")
+    parser.add_argument("--supersede", action="store_true",
+                        help="Cancel each user's previous computation when they submit a new one")
+    parser.add_argument("--timeout", type=float, default=30, help="Request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for user behaviour")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
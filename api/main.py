@@ -79,6 +79,18 @@ async def cache_stats():
     remove_expired_cache_entries()
     return get_cache_stats()
 
+@app.get("/api/computations/stats")
+async def computation_stats():
+    """Get computation statistics, including duplicated simulations and peak memory"""
+    from api.utils.forecast import get_computation_stats
+    return get_computation_stats()
+
+# Seed the cache with results precomputed by the batch runner
+cache_seed_file = os.environ.get("CACHE_SEED_FILE")
+if cache_seed_file:
+    from api.utils.cache import load_cache_seed
+    load_cache_seed(cache_seed_file, int(os.environ.get("CACHE_SEED_TTL_SECONDS", str(7 * 24 * 3600))))
+
 # Import and include routers from endpoints
 from api.endpoints import forecasts
 
@@ -139,4 +139,17 @@ def get_cache_stats() -> Dict[str, Any]:
         "entries": len(cache_store),
         "memory_usage_estimate_kb": len(json.dumps({k: v.get("expires", 0) for k, v in cache_store.items()})) / 1024,
     }
-    return stats
\ No newline at end of file
+    return stats
+
+def load_cache_seed(path: str, ttl_seconds: int) -> int:
+    """Load precomputed results from a cache seed file written by the batch runner"""
+    with open(path) as f:
+        seed = json.load(f)
+    # Results from the stub backend are synthetic and must never be served as forecasts
+    if seed.get("backend") != "policyengine":
+        raise ValueError(f"Cache seed {path} was not produced by the policyengine backend")
+    expires = time.time() + ttl_seconds
+    for key, data in seed["results"].items():
+        cache_store[key] = {"data": data, "expires": expires}
+    logger.info(f"Loaded {len(seed['results'])} cache entries from {path}")
+    return len(seed["results"])
@@ -0,0 +1,16 @@
+"""
+Cooperative cancellation for long-running computations
+"""
+from typing import Callable, Optional
+
+
+class ComputationCancelled(Exception):
+    """Raised at a year boundary when a computation has been cancelled"""
+
+
+def check_cancelled(should_cancel: Optional[Callable[[], Optional[str]]]) -> None:
+    """Raise ComputationCancelled if the computation should stop"""
+    if should_cancel is not None:
+        reason = should_cancel()
+        if reason:
+            raise ComputationCancelled(reason)
@@ -3,6 +3,8 @@ from policyengine_core.taxbenefitsystems.tax_benefit_system import *
 from policyengine_core.reforms import Reform
 from policyengine_uk.system import system
 import json
+import os
+import resource
 import pandas as pd
 import numpy as np
 from microdf import MicroDataFrame
@@ -10,13 +12,23 @@ import threading
 import uuid
 import hashlib
 import time
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional
 from api.utils.cache import cache_store
+from api.utils.cancellation import ComputationCancelled, check_cancelled
+from api.utils.stub_simulation import get_stub_dataframe
 
 START_YEAR = 2026
 COUNT_YEARS = 5
 FORECAST_YEARS = list(range(START_YEAR, START_YEAR + COUNT_YEARS))
 
+# "policyengine" runs the full microsimulation, "stub" uses synthetic data for load testing
+SIMULATION_BACKEND = os.environ.get("SIMULATION_BACKEND", "policyengine")
+
+# Computations that nobody has polled for this long are cancelled at the next year boundary.
+# The frontend polls every 10 seconds, but browsers throttle timers in background tabs to
+# roughly once a minute, so this allows several missed polls before giving up on a tab.
+POLL_TIMEOUT_SECONDS = float(os.environ.get("COMPUTATION_POLL_TIMEOUT_SECONDS", "300"))
+
 obr = system.parameters.gov.obr
 
 GROWFACTORS = {
@@ -46,12 +58,46 @@ def get_cumulative_growth(base_year: int, target_year: int, growth_rates: dict)
 # Store for running computations
 computation_store: Dict[str, Dict[str, Any]] = {} 
 
+# Counters for computations, used to measure load and duplicated work
+computation_stats = {"started": 0, "cache_hits": 0, "duplicates": 0, "completed": 0, "failed": 0, "cancelled": 0}
+# Number of simulations currently running for each cache key
+running_cache_keys: Dict[str, int] = {}
+computation_stats_lock = threading.Lock()
+
+# Cancellation requests for running computations
+cancel_events: Dict[str, threading.Event] = {}
+# Latest running computation and its cache key for each client, for superseding
+client_computations: Dict[str, Dict[str, str]] = {}
+client_computations_lock = threading.Lock()
+
 def get_computation_status(computation_id: str) -> Optional[Dict[str, Any]]:
-    """Get the status of a running computation"""
-    return computation_store.get(computation_id)
+    """Get the status of a running computation, recording that it was polled"""
+    computation = computation_store.get(computation_id)
+    if computation is not None:
+        computation["last_polled"] = time.time()
+    return computation
+
+def cancel_computation(computation_id: str) -> bool:
+    """Request cancellation of a running computation, returning whether it was running"""
+    event = cancel_events.get(computation_id)
+    if event is None:
+        return False
+    event.set()
+    return True
+
+def get_computation_stats() -> Dict[str, Any]:
+    """Get computation statistics and process memory usage"""
+    with computation_stats_lock:
+        stats = dict(computation_stats)
+        stats["running"] = sum(running_cache_keys.values())
+    stats["backend"] = SIMULATION_BACKEND
+    # ru_maxrss is reported in kilobytes on Linux
+    stats["peak_memory_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return stats
 
 def get_dataframe(
     growfactors: dict,
+    should_cancel: Optional[Callable[[], Optional[str]]] = None,
 ) -> MicroDataFrame:
     
     reform = {}
@@ -104,6 +150,7 @@ def get_dataframe(
     
     df = pd.DataFrame()
     for year in range(2025, START_YEAR + COUNT_YEARS):
+        check_cancelled(should_cancel)
         print("Calculating year", year)
         year_df = simulation.calculate_dataframe([
             "household_id",
@@ -129,6 +176,119 @@ def get_dataframe(
     
     return MicroDataFrame(df, weights="household_weight")
 
+def get_forecast_metrics(
+    growth_rates: dict,
+    should_cancel: Optional[Callable[[], Optional[str]]] = None,
+) -> Dict[str, Any]:
+    """Run the simulation for the given growth rates and calculate the impact metrics"""
+    # Get the dataframe with simulation results
+    if SIMULATION_BACKEND == "stub":
+        df = get_stub_dataframe(growth_rates, FORECAST_YEARS, should_cancel)
+    else:
+        df = get_dataframe(growth_rates, should_cancel)
+    
+    # Calculate median income by year
+    median_income_by_year = []
+    poverty_rate_by_year = []
+    decile_yearly_changes = []
+    
+    # Include 2025 as baseline
+    for year in range(2025, START_YEAR + len(FORECAST_YEARS)):
+        # Calculate median income
+        year_df = df[df.year == year]
+        median_income = year_df.real_household_net_income.median()
+        
+        median_income_by_year.append({
+            "year": int(year),
+            "value": float(median_income)
+        })
+        
+        # Calculate absolute poverty rates (BHC and AHC)
+        total_count = year_df.household_count_people.sum()
+        
+        # Absolute poverty AHC
+        in_poverty_ahc_count = year_df[year_df.in_poverty_ahc].household_count_people.sum()
+        poverty_rate_ahc = float(in_poverty_ahc_count / total_count)
+        
+        # Absolute poverty BHC 
+        in_poverty_bhc_count = year_df[year_df.in_poverty_bhc].household_count_people.sum()
+        poverty_rate_bhc = float(in_poverty_bhc_count / total_count)
+        
+        # Calculate relative poverty rates
+        # Relative poverty AHC (60% of median)
+        median_ahc = year_df.equiv_hbai_household_net_income_ahc.median()
+        poverty_threshold_ahc = median_ahc * 0.6
+        rel_poverty_ahc_count = year_df[year_df.equiv_hbai_household_net_income_ahc < poverty_threshold_ahc].household_count_people.sum()
+        rel_poverty_rate_ahc = float(rel_poverty_ahc_count / total_count)
+        
+        # Relative poverty BHC (60% of median)
+        median_bhc = year_df.equiv_hbai_household_net_income.median()
+        poverty_threshold_bhc = median_bhc * 0.6
+        rel_poverty_bhc_count = year_df[year_df.equiv_hbai_household_net_income < poverty_threshold_bhc].household_count_people.sum()
+        rel_poverty_rate_bhc = float(rel_poverty_bhc_count / total_count)
+        
+        poverty_rate_by_year.append({
+            "year": int(year),
+            "absolute_ahc": poverty_rate_ahc,
+            "absolute_bhc": poverty_rate_bhc,
+            "relative_ahc": rel_poverty_rate_ahc,
+            "relative_bhc": rel_poverty_rate_bhc
+        })
+        
+        # Calculate YoY percent changes if we have previous year data
+        if year > 2025:
+            year_df = df[df.year == year]
+            last_year_df = df[df.year == year - 1]
+            year_df["last_year_income_decile"] = last_year_df.household_income_decile.values
+            for decile in range(1, 11):
+                previous_income = last_year_df[last_year_df.household_income_decile == decile].real_household_net_income.sum()
+                current_income = year_df[year_df.last_year_income_decile == decile].real_household_net_income.sum()
+                percent_change = (current_income - previous_income) / previous_income
+                
+                decile_yearly_changes.append({
+                    "decile": decile,
+                    "year": int(year),
+                    "change": float(percent_change)
+                })
+    
+    # Transform poverty_rate_by_year into separate metrics for API compatibility
+    absolute_poverty_ahc_by_year = []
+    absolute_poverty_bhc_by_year = []
+    relative_poverty_ahc_by_year = []
+    relative_poverty_bhc_by_year = []
+    
+    for entry in poverty_rate_by_year:
+        year = entry["year"]
+        
+        absolute_poverty_ahc_by_year.append({
+            "year": year,
+            "value": entry["absolute_ahc"]
+        })
+        
+        absolute_poverty_bhc_by_year.append({
+            "year": year,
+            "value": entry["absolute_bhc"]
+        })
+        
+        relative_poverty_ahc_by_year.append({
+            "year": year,
+            "value": entry["relative_ahc"]
+        })
+        
+        relative_poverty_bhc_by_year.append({
+            "year": year,
+            "value": entry["relative_bhc"]
+        })
+    
+    return {
+        "median_income_by_year": median_income_by_year,
+        "absolute_poverty_ahc_by_year": absolute_poverty_ahc_by_year,
+        "absolute_poverty_bhc_by_year": absolute_poverty_bhc_by_year,
+        "relative_poverty_ahc_by_year": relative_poverty_ahc_by_year,
+        "relative_poverty_bhc_by_year": relative_poverty_bhc_by_year,
+        "decile_yearly_changes": decile_yearly_changes,
+    }
+
 def get_cache_key_for_computation(growth_rates):
     """Generate a cache key for the computation based on growth rates"""
     # Convert growth rates to a stable string format for hashing
@@ -136,16 +296,33 @@ def get_cache_key_for_computation(growth_rates):
     key = f"forecast_impact:{growth_rates_str}"
     return hashlib.md5(key.encode()).hexdigest()
 
-def start_computation(growth_rates):
-    """Start a computation in a background thread and return a computation ID"""
-    # Check if we already have a cached result
+def start_computation(growth_rates, client_id: Optional[str] = None, supersede: bool = False):
+    """Start a computation in a background thread and return a computation ID
+
+    If supersede is set, the client's previous computation is cancelled, unless it
+    is still running with the same growth rates, in which case its ID is returned.
+    """
     cache_key = get_cache_key_for_computation(growth_rates)
+    if client_id and supersede:
+        with client_computations_lock:
+            previous = client_computations.get(client_id)
+        if previous:
+            previous_id = previous["computation_id"]
+            event = cancel_events.get(previous_id)
+            if previous["cache_key"] == cache_key and event is not None and not event.is_set():
+                return previous_id
+            if cancel_computation(previous_id):
+                print(f"Superseding computation {previous_id} for client {client_id}")
+
+    # Check if we already have a cached result
     if cache_key in cache_store:
         entry = cache_store[cache_key]
         # Check if it's not expired
         if entry["expires"] > time.time():
             # Create a computation ID for this cached result
             computation_id = str(uuid.uuid4())
+            with computation_stats_lock:
+                computation_stats["cache_hits"] += 1
             computation_store[computation_id] = {
                 "status": "completed",
                 "result": entry["data"],
@@ -155,113 +332,19 @@ def start_computation(growth_rates):
     
     # Create a new computation ID
     computation_id = str(uuid.uuid4())
+    cancel_event = threading.Event()
+    
+    def should_cancel() -> Optional[str]:
+        if cancel_event.is_set():
+            return "Computation superseded by a newer request"
+        # The entry is only replaced by run_computation itself, once it finishes
+        if time.time() - computation_store[computation_id]["last_polled"] > POLL_TIMEOUT_SECONDS:
+            return f"Computation not polled within {POLL_TIMEOUT_SECONDS:.0f} seconds"
+        return None
     
     def run_computation():
         try:
-            # Get the dataframe with simulation results
-            df = get_dataframe(growth_rates)
-            
-            # Calculate median income by year
-            median_income_by_year = []
-            poverty_rate_by_year = []
-            decile_yearly_changes = []
-            
-            # Include 2025 as baseline
-            for year in range(2025, START_YEAR + len(FORECAST_YEARS)):
-                # Calculate median income
-                year_df = df[df.year == year]
-                median_income = year_df.real_household_net_income.median()
-                
-                median_income_by_year.append({
-                    "year": int(year),
-                    "value": float(median_income)
-                })
-                
-                # Calculate absolute poverty rates (BHC and AHC)
-                total_count = year_df.household_count_people.sum()
-                
-                # Absolute poverty AHC
-                in_poverty_ahc_count = year_df[year_df.in_poverty_ahc].household_count_people.sum()
-                poverty_rate_ahc = float(in_poverty_ahc_count / total_count)
-                
-                # Absolute poverty BHC 
-                in_poverty_bhc_count = year_df[year_df.in_poverty_bhc].household_count_people.sum()
-                poverty_rate_bhc = float(in_poverty_bhc_count / total_count)
-                
-                # Calculate relative poverty rates
-                # Relative poverty AHC (60% of median)
-                median_ahc = year_df.equiv_hbai_household_net_income_ahc.median()
-                poverty_threshold_ahc = median_ahc * 0.6
-                rel_poverty_ahc_count = year_df[year_df.equiv_hbai_household_net_income_ahc < poverty_threshold_ahc].household_count_people.sum()
-                rel_poverty_rate_ahc = float(rel_poverty_ahc_count / total_count)
-                
-                # Relative poverty BHC (60% of median)
-                median_bhc = year_df.equiv_hbai_household_net_income.median()
-                poverty_threshold_bhc = median_bhc * 0.6
-                rel_poverty_bhc_count = year_df[year_df.equiv_hbai_household_net_income < poverty_threshold_bhc].household_count_people.sum()
-                rel_poverty_rate_bhc = float(rel_poverty_bhc_count / total_count)
-                
-                poverty_rate_by_year.append({
-                    "year": int(year),
-                    "absolute_ahc": poverty_rate_ahc,
-                    "absolute_bhc": poverty_rate_bhc,
-                    "relative_ahc": rel_poverty_rate_ahc,
-                    "relative_bhc": rel_poverty_rate_bhc
-                })
-                
-                # Calculate YoY percent changes if we have previous year data
-                if year > 2025:
-                    year_df = df[df.year == year]
-                    last_year_df = df[df.year == year - 1]
-                    year_df["last_year_income_decile"] = last_year_df.household_income_decile.values
-                    for decile in range(1, 11):
-                        previous_income = last_year_df[last_year_df.household_income_decile == decile].real_household_net_income.sum()
-                        current_income = year_df[year_df.last_year_income_decile == decile].real_household_net_income.sum()
-                        percent_change = (current_income - previous_income) / previous_income
-                        
-                        decile_yearly_changes.append({
-                            "decile": decile,
-                            "year": int(year),
-                            "change": float(percent_change)
-                        })
-            
-            # Transform poverty_rate_by_year into separate metrics for API compatibility
-            absolute_poverty_ahc_by_year = []
-            absolute_poverty_bhc_by_year = []
-            relative_poverty_ahc_by_year = []
-            relative_poverty_bhc_by_year = []
-            
-            for entry in poverty_rate_by_year:
-                year = entry["year"]
-                
-                absolute_poverty_ahc_by_year.append({
-                    "year": year,
-                    "value": entry["absolute_ahc"]
-                })
-                
-                absolute_poverty_bhc_by_year.append({
-                    "year": year,
-                    "value": entry["absolute_bhc"]
-                })
-                
-                relative_poverty_ahc_by_year.append({
-                    "year": year,
-                    "value": entry["relative_ahc"]
-                })
-                
-                relative_poverty_bhc_by_year.append({
-                    "year": year,
-                    "value": entry["relative_bhc"]
-                })
-            
-            result = {
-                "median_income_by_year": median_income_by_year,
-                "absolute_poverty_ahc_by_year": absolute_poverty_ahc_by_year,
-                "absolute_poverty_bhc_by_year": absolute_poverty_bhc_by_year,
-                "relative_poverty_ahc_by_year": relative_poverty_ahc_by_year,
-                "relative_poverty_bhc_by_year": relative_poverty_bhc_by_year,
-                "decile_yearly_changes": decile_yearly_changes,
-            }
+            result = get_forecast_metrics(growth_rates, should_cancel)
             
             # Store the completed result in the computation store
             computation_store[computation_id] = {
@@ -275,7 +358,18 @@ def start_computation(growth_rates):
                 "data": result,
                 "expires": time.time() + 1800  # 30 minutes cache
             }
+            with computation_stats_lock:
+                computation_stats["completed"] += 1
             
+        except ComputationCancelled as e:
+            print(f"Cancelled computation {computation_id}: {e}")
+            computation_store[computation_id] = {
+                "status": "cancelled",
+                "error": str(e),
+                "cached": False
+            }
+            with computation_stats_lock:
+                computation_stats["cancelled"] += 1
         except Exception as e:
             # Store the error
             computation_store[computation_id] = {
@@ -283,13 +377,37 @@ def start_computation(growth_rates):
                 "error": str(e),
                 "cached": False
             }
+            with computation_stats_lock:
+                computation_stats["failed"] += 1
+        finally:
+            cancel_events.pop(computation_id, None)
+            with client_computations_lock:
+                previous = client_computations.get(client_id)
+                if previous and previous["computation_id"] == computation_id:
+                    del client_computations[client_id]
+            with computation_stats_lock:
+                running_cache_keys[cache_key] -= 1
+                if running_cache_keys[cache_key] == 0:
+                    del running_cache_keys[cache_key]
     
     # Store the initial status
     computation_store[computation_id] = {
         "status": "computing",
         "result": None,
-        "cached": False
+        "cached": False,
+        "last_polled": time.time()
     }
+    cancel_events[computation_id] = cancel_event
+    if client_id:
+        with client_computations_lock:
+            client_computations[client_id] = {"computation_id": computation_id, "cache_key": cache_key}
+    
+    with computation_stats_lock:
+        computation_stats["started"] += 1
+        # Another simulation with the same growth rates is already running
+        if running_cache_keys.get(cache_key, 0) > 0:
+            computation_stats["duplicates"] += 1
+        running_cache_keys[cache_key] = running_cache_keys.get(cache_key, 0) + 1
     
     # Start the computation in a background thread
     thread = threading.Thread(target=run_computation)
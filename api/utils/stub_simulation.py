@@ -0,0 +1,80 @@
+"""
+Stub simulation backend for load testing
+
+Produces a synthetic household dataframe with the same columns as
+get_dataframe, so the API can be exercised without running PolicyEngine.
+"""
+import os
+import time
+from typing import Callable, List, Optional
+import numpy as np
+import pandas as pd
+from microdf import MicroDataFrame
+from api.utils.cancellation import check_cancelled
+
+# Simulated cost of calculating a single year, to mimic PolicyEngine latency
+STUB_SECONDS_PER_YEAR = float(os.environ.get("STUB_SECONDS_PER_YEAR", "1.0"))
+STUB_HOUSEHOLDS = int(os.environ.get("STUB_HOUSEHOLDS", "5000"))
+
+BASE_YEAR = 2025
+
+
+def get_stub_dataframe(
+    growfactors: dict,
+    forecast_years: List[int],
+    should_cancel: Optional[Callable[[], Optional[str]]] = None,
+    seconds_per_year: float = STUB_SECONDS_PER_YEAR,
+    households: int = STUB_HOUSEHOLDS,
+) -> MicroDataFrame:
+    """Build a synthetic household dataframe grown by the given growth factors"""
+    # Fixed seed so identical growth rates always give identical results
+    rng = np.random.default_rng(0)
+    weights = rng.uniform(500, 1500, households)
+    people = rng.integers(1, 6, households)
+    earned = rng.lognormal(10, 0.8, households)
+    mixed = rng.lognormal(8, 1.2, households) * (rng.random(households) < 0.15)
+    capital = rng.lognormal(7, 1.5, households) * (rng.random(households) < 0.4)
+    housing_costs = rng.uniform(3000, 15000, households)
+    # Absolute poverty line in base year prices, fixed in real terms
+    absolute_line = np.median(earned) * 0.6
+
+    price_index = 1
+    df = pd.DataFrame()
+    for year in [BASE_YEAR] + forecast_years:
+        check_cancelled(should_cancel)
+        if year in forecast_years:
+            earned = earned * (1 + growfactors["earned_income"][year])
+            mixed = mixed * (1 + growfactors["mixed_income"][year])
+            capital = capital * (1 + growfactors["capital_income"][year])
+            price_index *= 1 + growfactors["inflation"][year]
+            housing_costs = housing_costs * (1 + growfactors["inflation"][year])
+        time.sleep(seconds_per_year)
+
+        net_income = earned + mixed + capital
+        equivalised_bhc = net_income / np.sqrt(people)
+        equivalised_ahc = (net_income - housing_costs) / np.sqrt(people)
+        year_df = pd.DataFrame({
+            "household_id": np.arange(households),
+            "household_weight": weights,
+            "household_count_people": people,
+            "household_net_income": net_income,
+            "real_household_net_income": net_income / price_index,
+            "employment_income": earned,
+            "self_employment_income": mixed,
+            "dividend_income": capital,
+            "consumption": net_income * 0.9,
+            "in_poverty_ahc": equivalised_ahc / price_index < absolute_line * 0.8,
+            "in_poverty_bhc": equivalised_bhc / price_index < absolute_line,
+            "equiv_hbai_household_net_income_ahc": equivalised_ahc,
+            "equiv_hbai_household_net_income": equivalised_bhc,
+        })
+        year_df["household_income_decile"] = pd.qcut(
+            year_df.real_household_net_income.rank(method="first"), 10, labels=False
+        ) + 1
+        year_df["year"] = year
+        df = pd.concat([
+            df,
+            year_df,
+        ])
+
+    return MicroDataFrame(df, weights="household_weight")
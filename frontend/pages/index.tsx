@@ -42,7 +42,7 @@ interface ForecastData {
 
 interface ComputationResponse {
   computation_id: string;
-  status: 'computing' | 'completed' | 'failed';
+  status: 'computing' | 'completed' | 'failed' | 'cancelled';
   result?: ForecastData;
   error?: string;
 }
@@ -66,6 +66,8 @@ const Home: NextPage = () => {
   
   // For polling
   const pollingInterval = useRef<NodeJS.Timeout | null>(null);
+  // Identifies this browser session so a new analysis cancels the previous one
+  const clientId = useRef<string>(Math.random().toString(36).slice(2));
 
   // Fetch available forecasts and default growth rates
   useEffect(() => {
@@ -152,8 +154,8 @@ const Home: NextPage = () => {
           clearInterval(pollingInterval.current);
           pollingInterval.current = null;
         }
-      } else if (status === 'failed') {
-        // Computation failed
+      } else if (status === 'failed' || status === 'cancelled') {
+        // Computation failed or was cancelled
         setError(computationError || 'Computation failed unexpectedly');
         setIsComputing(false);
         setIsLoading(false);
@@ -202,6 +204,8 @@ const Home: NextPage = () => {
         '/api/forecasts/impact', {
         forecast_id: forecastType === 'actual' ? selectedForecast : 'custom',
         growth_rates: forecastType === 'custom' ? customGrowthRates : undefined,
+        client_id: clientId.current,
+        supersede: true,
       });
 
       const { status, computation_id, result, error: computationError } = response.data;